@@ -20,6 +20,6 @@ elif rc == 0:                   # child
 else:                           # parent (forked ok)
     os.write(1, ("Parent: My pid=%d.  Child's pid=%d\n" % 
                  (pid, rc)).encode())
-    childPidCode = os.wait()
+    childPidCode = os.waitpid(rc, 0) # reap only our child, not any child
     os.write(1, ("Parent: Child %d terminated with exit code %d\n" % 
                  childPidCode).encode())
@@ -1,142 +1,280 @@
 #!/usr/bin/env python3
 
 import os
+import readline #enables line editing and history in input()
+import stat
 import sys
-import re
 
-_TOKEN_RE = re.compile(r'''(?x)
-\s*(
-    "(?:\\.|[^"\\])*"   |   #double quotes
-    '(?:\\.|[^'\\])*'   |   #single quotes
-    [^\s]+                  #unquoted
-    )
-''')
+#tokenizer states
+_DEFAULT, _IN_SQUOTE, _IN_DQUOTE = 0, 1, 2
 
 def split_cmdline(s: str) -> list[str]:
-    tokens = [m.group(1) for m in _TOKEN_RE.finditer(s)]
-    out = []
-    for t in tokens:
-        if len(t) >= 2 and ((t[0] == '"' and t[-1] == '"')  or (t[0] == "'" and t[-1] == "'")):
-            t = t[1:-1] #strip surrounding quotes
-        #minimal unescape for \" and \'
-        t = t.replace(r'\"', '"').replace(r"\'", "'").replace(r"\\", "\\")
-        out.append(t)
-    return out
+    """One linear pass over s, no backtracking.
+
+    Quotes group characters into a token and are stripped; backslash
+    escapes the next character (inside double quotes only \\ and \").
+    An unterminated quote just runs to end of line.
+    """
+    #common case: nothing to quote or escape, one C-level split
+    if '"' not in s and "'" not in s and "\\" not in s:
+        return s.split()
+
+    tokens: list[str] = []
+    buf: list[str] = []
+    in_token = False
+    state = _DEFAULT
+    escape = False
+
+    for c in s:
+        if escape:
+            if state == _IN_DQUOTE and c not in ('"', "\\"):
+                buf.append("\\")  #backslash is literal here
+            buf.append(c)
+            escape = False
+        elif state == _IN_SQUOTE:
+            if c == "'":
+                state = _DEFAULT
+            else:
+                buf.append(c)
+        elif c == "\\" and state != _IN_SQUOTE:
+            escape = True
+            in_token = True
+        elif state == _IN_DQUOTE:
+            if c == '"':
+                state = _DEFAULT
+            else:
+                buf.append(c)
+        elif c == "'":
+            state = _IN_SQUOTE
+            in_token = True
+        elif c == '"':
+            state = _IN_DQUOTE
+            in_token = True
+        elif c.isspace():
+            if in_token:
+                tokens.append("".join(buf))
+                buf.clear()
+                in_token = False
+        else:
+            buf.append(c)
+            in_token = True
+
+    if escape:
+        buf.append("\\")
+    if in_token:
+        tokens.append("".join(buf))
+    return tokens
+
+#name -> full path for every executable on PATH, like bash's hash table
+#built lazily on first lookup, rebuilt when PATH changes or on hash -r
+_exec_hash: dict[str, str] | None = None
+
+#PATH split once and reused until the PATH string itself changes
+_path_cache: tuple[str, list[str]] | None = None
+
+def _path_dirs() -> list[str]:
+    global _path_cache, _exec_hash
+    path = os.environ.get("PATH", "")
+    if _path_cache is not None and (_path_cache[0] is path or _path_cache[0] == path):
+        return _path_cache[1]
+    #PATH changed, everything derived from it is stale
+    _exec_hash = None
+    dirs = [d if d != "" else "." for d in path.split(":")]
+    _path_cache = (path, dirs)
+    return dirs
+
+def _build_exec_hash() -> dict[str, str]:
+    table: dict[str, str] = {}
+    for directory in _path_dirs():
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    #d_type from readdir answers both checks without a stat;
+                    #only symlinks need a real stat to see what they point at
+                    if not entry.is_symlink():
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    else:
+                        st = os.stat(entry.path)
+                        if not stat.S_ISREG(st.st_mode):
+                            continue
+                    if st.st_mode & 0o111:
+                        #first directory on PATH wins
+                        table.setdefault(entry.name, entry.path)
+                except OSError:
+                    continue
+    return table
 
 def find_executable(cmd: str) -> str | None:
     #if command includes a slash, treat it as a path
     if "/" in cmd:
-        return cmd if os.path.isfile(cmd) and os.access(cmd, os.X_OK) else None
+        try:
+            st = os.stat(cmd)
+        except OSError:
+            return None
+        return cmd if stat.S_ISREG(st.st_mode) and st.st_mode & 0o111 else None
 
-    path = os.environ.get("PATH", "")
-    for directory in path.split(":"):
-        if directory == "":
-            directory = "."
-        candidate = os.path.join(directory, cmd)
-        if os.access(candidate, os.X_OK) and os.path.isfile(candidate):
-            return candidate
-    return None
+    global _exec_hash
+    _path_dirs() #drops a stale hash if PATH changed
+    if _exec_hash is None:
+        _exec_hash = _build_exec_hash()
+    return _exec_hash.get(cmd)
+
+#pids of live background jobs, so reaping can be skipped when there are none
+_bg_pids: set[int] = set()
+
+#fixed message pieces, concatenated instead of f-string formatted
+_EXIT_MSG = "Program terminated with exit code "
+_NOT_FOUND_MSG = ": command not found\n"
 
 def run_command(argv: list[str], infile: str | None = None, outfile: str | None = None, background: bool = False) -> None:
     prog = argv[0]
-    exe = find_executable(prog)
-    if exe is None:
-        print(f"{prog}: command not found", file=sys.stdout)
-        return
-
-    pid = os.fork()
-    if pid == 0:
-        try:
-            if infile is not None:
-                fd_in = os.open(infile, os.O_RDONLY)
-                os.dup2(fd_in, 0)
-                os.close(fd_in)
-            
-            if outfile is not None:
-                fd_out = os.open(outfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
-                os.dup2(fd_out, 1)
-                os.close(fd_out)
-
-            os.execve(exe, argv, os.environ)
-        except OSError as e:
-            #if exec fails exit with non zero
-            print(e, file=sys.stderr)
-            os._exit(1)
+    if "/" in prog:
+        exe = find_executable(prog)
+        if exe is None:
+            sys.stdout.write(prog + _NOT_FOUND_MSG)
+            return
     else:
-        #parent wait for child
-        if background:
+        #O(1) hash lookup; on a miss (e.g. stale hash) let libc walk PATH
+        exe = find_executable(prog)
+
+    #posix_spawn avoids fork's page-table copy; redirections become file actions
+    file_actions = []
+    if infile is not None:
+        file_actions.append((os.POSIX_SPAWN_OPEN, 0, infile, os.O_RDONLY, 0))
+    if outfile is not None:
+        file_actions.append((os.POSIX_SPAWN_OPEN, 1, outfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644))
+
+    try:
+        if exe is not None:
+            pid = os.posix_spawn(exe, argv, os.environ, file_actions=file_actions)
+        else:
+            #posix_spawnp resolves PATH in libc, no parent-side stats at all
+            pid = os.posix_spawnp(prog, argv, os.environ, file_actions=file_actions)
+    except OSError as e:
+        if isinstance(e, FileNotFoundError) and not file_actions:
+            #no file actions, so the command itself is what's missing
+            sys.stdout.write(prog + _NOT_FOUND_MSG)
             return
-        _, status = os.waitpid(pid, 0)
-        if os.WIFEXITED(status):
-            code = os.WEXITSTATUS(status)
-            if code != 0:
-                print(f"Program terminated with exit code {code}.", file=sys.stderr)
-        elif os.WIFSIGNALED(status):
-            #if killed by signal treat as non zero
-            sig = os.WTERMSIG(status)
-            print(f"Program terminated with exit code {128 + sig}.", file=sys.stdout)
-
-def parse_redirections(tokens: list[str]) -> tuple[list[str], str | None, str | None]:
-    """Parse < infile and > outfile. Returns (argv, infile, outfile)"""
+        #fall back to classic fork+exec; with file actions the same error
+        #can mean a missing redirection file, which the fork path reports
+        pid = os.fork()
+        if pid == 0:
+            try:
+                if infile is not None:
+                    fd_in = os.open(infile, os.O_RDONLY)
+                    os.dup2(fd_in, 0)
+                    os.close(fd_in)
+
+                if outfile is not None:
+                    fd_out = os.open(outfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                    os.dup2(fd_out, 1)
+                    os.close(fd_out)
+
+                try:
+                    os.execvpe(exe if exe is not None else prog, argv, os.environ)
+                except FileNotFoundError:
+                    #only the exec miss means command not found
+                    os._exit(127)
+            except OSError as e:
+                #if exec fails exit with non zero
+                print(e, file=sys.stderr)
+                os._exit(1)
+
+    #parent wait for child
+    if background:
+        _bg_pids.add(pid)
+        return
+    _, status = os.waitpid(pid, 0)
+    if os.WIFEXITED(status):
+        code = os.WEXITSTATUS(status)
+        if code == 127 and exe is None:
+            #fallback child could not resolve the command either
+            sys.stdout.write(prog + _NOT_FOUND_MSG)
+        elif code != 0:
+            sys.stderr.write(_EXIT_MSG + str(code) + ".\n")
+    elif os.WIFSIGNALED(status):
+        #if killed by signal treat as non zero
+        sig = os.WTERMSIG(status)
+        sys.stdout.write(_EXIT_MSG + str(128 + sig) + ".\n")
+
+def parse_command(tokens: list[str]) -> list[tuple[list[str], str | None, str | None]]:
+    """Single pass over tokens, splitting on | and pulling out < and >.
+    Returns one (argv, infile, outfile) tuple per pipeline segment."""
+    segments: list[tuple[list[str], str | None, str | None]] = []
     argv: list[str] = []
     infile: str | None = None
     outfile: str | None = None
 
     i = 0
-    while i < len(tokens): 
+    start = 0 #first index of the current run of plain argv tokens
+    while i < len(tokens):
         t = tokens[i]
-        if t == "<":
-            if i + 1 >= len(tokens):
+        if t == "|":
+            if start != i:
+                argv.extend(tokens[start:i]) #flush run as one slice
+            if not argv and infile is None and outfile is None:
+                raise ValueError("missing command before |")
+            segments.append((argv, infile, outfile))
+            argv, infile, outfile = [], None, None
+            i += 1
+            start = i
+        elif t == "<":
+            if start != i:
+                argv.extend(tokens[start:i])
+            #an operator is not a file name
+            if i + 1 >= len(tokens) or tokens[i + 1] in ("|", "<", ">"):
                 raise ValueError("missing file name after <")
             infile = tokens[i + 1]
             i += 2
+            start = i
         elif t == ">":
-            if i + 1 >= len(tokens):
+            if start != i:
+                argv.extend(tokens[start:i])
+            if i + 1 >= len(tokens) or tokens[i + 1] in ("|", "<", ">"):
                 raise ValueError("missing file name after >")
             outfile = tokens[i + 1]
             i += 2
+            start = i
         else:
-            argv.append(t)
             i += 1
 
-    return argv, infile, outfile
-
-def split_pipeline(tokens: list[str]) -> list[list[str]]:
-    segs: list[list[str]] = []
-    cur: list[str] = []
-    for t in tokens:
-        if t == "|":
-            if not cur:
-                raise ValueError("missing command before |")
-            segs.append(cur)
-            cur = []
-        else:
-            cur.append(t)
-    if not cur:
+    if start != len(tokens):
+        argv.extend(tokens[start:])
+    if segments and not argv and infile is None and outfile is None:
         raise ValueError("missing command after |")
-    segs.append(cur)
-    return segs
+    segments.append((argv, infile, outfile))
+    return segments
 
-def run_pipeline(segments: list[list[str]], background : bool = False) -> None:
+def run_pipeline(segments: list[tuple[list[str], str | None, str | None]], background : bool = False) -> None:
     """
-    list of token list, each segement may contain < or >
-    rule: allow < only on first segment, > only on last segment 
+    list of (argv, infile, outfile) per command
+    rule: allow < only on first segment, > only on last segment
     """
     n = len(segments)
     pids: list[int] = []
     prev_read: int | None = None
 
+    #validate every segment before the first fork, so a syntax error
+    #cannot leave already-forked children unreaped
     for i in range(n):
-        #parse redirections per segment 
-        argv, infile, outfile = parse_redirections(segments[i])
+        argv, infile, outfile = segments[i]
         if not argv:
             raise ValueError("empty command in pipeline")
-        
+
         if i != 0 and infile is not None:
             raise ValueError("input redirection only allowed on first command of pipeline")
         if i != n - 1 and outfile is not None:
             raise ValueError("output redirection only allowed on last command of pipeline")
 
+    for i in range(n):
+        argv, infile, outfile = segments[i]
+
         #set up pipe to next command unless last
         if i != n - 1:
           r, w = os.pipe()
@@ -145,12 +283,16 @@ def run_pipeline(segments: list[list[str]], background : bool = False) -> None:
 
         pid = os.fork()
         if pid == 0:
-            #child 
+            #child
             try:
+                #pipe and redirection fds are close-on-exec (PEP 446), so
+                #only the dup2'd copies on 0/1 survive the exec; no manual
+                #os.close calls needed in the child
+
                 #if there is a previous pipe connect to stdin
                 if prev_read is not None:
                     os.dup2(prev_read, 0)
-            
+
                 #if there is a next pipe connect stdout to it
                 if w is not None:
                     os.dup2(w, 1)
@@ -159,26 +301,22 @@ def run_pipeline(segments: list[list[str]], background : bool = False) -> None:
                 if infile is not None:
                     fd_in = os.open(infile, os.O_RDONLY)
                     os.dup2(fd_in, 0)
-                    os.close(fd_in)
 
                 #apply > on last command
                 if outfile is not None:
                     fd_out = os.open(outfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
                     os.dup2(fd_out, 1)
-                    os.close(fd_out)
-
-                #close fd's we dont need
-                if prev_read is not None:
-                    os.close(prev_read)
-                if r is not None:
-                    os.close(r)
-                if w is not None:
-                    os.close(w)
 
                 #exec
                 exe = find_executable(argv[0])
+                if exe is None and "/" not in argv[0]:
+                    #hash may be stale; let libc rescan PATH like run_command
+                    try:
+                        os.execvpe(argv[0], argv, os.environ)
+                    except FileNotFoundError:
+                        pass
                 if exe is None:
-                    print(f"{argv[0]}: command not found", file=sys.stderr)
+                    sys.stderr.write(argv[0] + _NOT_FOUND_MSG)
                     os._exit(127)
 
                 os.execve(exe, argv, os.environ)
@@ -204,6 +342,7 @@ def run_pipeline(segments: list[list[str]], background : bool = False) -> None:
         os.close(prev_read)
     
     if background:
+        _bg_pids.update(pids)
         return
     #wait for all children; report exit code of the last command
     last_status = 0
@@ -214,19 +353,23 @@ def run_pipeline(segments: list[list[str]], background : bool = False) -> None:
     if os.WIFEXITED(last_status):
         code = os.WEXITSTATUS(last_status)
         if code != 0:
-            print(f"Program terminated with exit code {code}.", file=sys.stderr)
+            sys.stderr.write(_EXIT_MSG + str(code) + ".\n")
     elif os.WIFSIGNALED(last_status):
         sig = os.WTERMSIG(last_status)
-        print(f"Program terminated with exit code {128 + sig}.", file=sys.stdout)
+        sys.stdout.write(_EXIT_MSG + str(128 + sig) + ".\n")
 
 def reap_background() -> None:
+    if not _bg_pids:
+        return #no background jobs, skip the syscall
     while True:
         try:
             pid, _ = os.waitpid(-1, os.WNOHANG)
         except ChildProcessError:
+            _bg_pids.clear()
             return #no children
         if pid ==0:
             return #none finished yet
+        _bg_pids.discard(pid)
 
 def logical_pwd_update(target: str) -> None:
     old = os.environ.get("PWD", os.getcwd())
@@ -239,30 +382,37 @@ def logical_pwd_update(target: str) -> None:
     os.environ["PWD"] = new
 
 def main():
+    #PS1 is read once; no env lookup per prompt
+    prompt = os.environ.get("PS1", "$ ")
 
     while True:
         reap_background()
 
         try:
-            prompt = os.environ.get("PS1", "$ ")
             line = input(prompt)
         except EOFError:
             if sys.stdin.isatty():
                 print()
             break
 
-        if not line.strip():
-            continue
-        
         line = line.strip()
-        if line == "exit":
-            break
-        
+        if not line:
+            continue
+
         #simple tokenization
-        tokens = split_cmdline(line)
+        try:
+            tokens = split_cmdline(line)
+        except ValueError as e:
+            #e.g. unterminated quote
+            print(f"Syntax error: {e}", file=sys.stdout)
+            continue
         if not tokens:
             continue
 
+        #built in exit, dispatched on tokens like cd and hash
+        if tokens[0] == "exit":
+            break
+
         background = False
         if tokens and tokens[-1] == "&":
             background = True
@@ -270,24 +420,35 @@ def main():
             if not tokens:
                 continue
 
-        if "|" in tokens:
+        #one pass splits the pipeline and pulls out < and >
+        try:
+            segments = parse_command(tokens)
+        except ValueError as e:
+            print(f"Syntax error: {e}", file=sys.stdout)
+            continue
+
+        if len(segments) > 1:
             try:
-                segement = split_pipeline(tokens)
-                run_pipeline(segement, background=background)
+                run_pipeline(segments, background=background)
             except ValueError as e:
                 print(f"Syntax error: {e}", file=sys.stdout)
             continue
 
-        #parse < and >
-        try:
-            argv, infile, outfile = parse_redirections(tokens)
-        except ValueError as e:
-            print(f"Syntax error: {e}", file=sys.stdout)
-            continue
+        argv, infile, outfile = segments[0]
 
         if not argv:
             continue 
 
+        #built in hash: show remembered locations, hash -r forgets them
+        if argv[0] == "hash":
+            global _exec_hash
+            if argv[1:] == ["-r"]:
+                _exec_hash = None
+            elif _exec_hash is not None:
+                for exe in sorted(_exec_hash.values()):
+                    print(exe)
+            continue
+
         #built in CD
         if argv[0] == "cd":
             target = argv[1] if len(argv) > 1 else os.environ.get("HOME", "/")